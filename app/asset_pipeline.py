@@ -44,10 +44,12 @@ def generate_assets(
     voice_id: Optional[str],
     outputs: List[str],     # any of: mp3, wav, srt, ass, vtt, mp4
     style: Optional[Dict] = None,
+    batch_mode: bool = False,
 ) -> Dict[str, bytes]:
     """
     Back-end entry used by main.py.
     Returns { ext: bytes } for requested outputs.
+    batch_mode: synthesise the story in a few large requests instead of one per sentence.
     """
     req = {o.lower() for o in outputs}
     cfg = _style_from_payload(style)
@@ -67,6 +69,7 @@ def generate_assets(
         bold=bool(cfg["bold"]),
         italic=bool(cfg["italic"]),
         resolution=cfg["resolution"],
+        batch_mode=batch_mode,
     )
 
     have: Dict[str, bytes] = {}
@@ -14,8 +14,12 @@ import os
 import re
 import tempfile
 import subprocess
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
 
+from app.media_info import DURATION_SLACK_SEC, audio_duration
+from app.tts import ass_of, split_hms, srt_of
 
 # ---------- basic cleanup ----------
 
@@ -32,6 +36,7 @@ _SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
 _CLAUSE_SPLIT = re.compile(r"\s*[,;:—–-]\s*")   # commas, semicolons, dashes
 
 
+@lru_cache(maxsize=32)
 def _estimate_max_cols(
     *,
     resolution: str = "1080x1920",
@@ -193,39 +198,49 @@ def make_captions(
 
 # ---------- timestamp helpers ----------
 
-def _fmt_srt_ts(sec: float) -> str:
-    h = int(sec // 3600)
-    m = int((sec % 3600) // 60)
-    s = int(sec % 60)
-    ms = int((sec - int(sec)) * 1000)
-    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+def _fmt_srt_ts(ms: int) -> str:
+    return srt_of(*split_hms(ms))
 
 
-def _fmt_ass_ts(sec: float) -> str:
-    h = int(sec // 3600)
-    m = int((sec % 3600) // 60)
-    s = int(sec % 60)
-    cs = int((sec - int(sec)) * 100)  # centiseconds
-    return f"{h:01d}:{m:02d}:{s:02d}.{cs:02d}"
+def _fmt_ass_ts(ms: int) -> str:
+    return ass_of(*split_hms(ms))
 
 
 # ---------- writers: SRT / VTT / ASS ----------
 
+def _timeline_ms(segs: List[Tuple[str, float]]) -> List[Tuple[str, int, int]]:
+    """
+    (line, start_ms, end_ms) per segment on an integer-ms timeline. Ends are exact sums of
+    the rounded durations; each cue starts where the previous one ended and is nudged to at
+    least 10 ms long (one ASS centisecond), so zero/negative durations can never emit
+    inverted, zero-length or overlapping cues in any format.
+    """
+    out: List[Tuple[str, int, int]] = []
+    a = 0
+    for (line, _), end in zip(segs, accumulate(round(d * 1000) for _, d in segs)):
+        b = max(end, a + 10)
+        out.append((line, a, b))
+        a = b
+    return out
+
+
 def write_srt(segs: List[Tuple[str, float]]) -> str:
-    t = 0.0
-    out: List[str] = []
-    for i, (line, dur) in enumerate(segs, start=1):
-        out += [str(i), f"{_fmt_srt_ts(t)} --> {_fmt_srt_ts(t + dur)}", line, ""]
-        t += dur
+    out: List[str] = [""] * (len(segs) * 4)
+    for i, (line, a, b) in enumerate(_timeline_ms(segs)):
+        j = i * 4
+        out[j] = str(i + 1)
+        out[j + 1] = f"{_fmt_srt_ts(a)} --> {_fmt_srt_ts(b)}"
+        out[j + 2] = line
     return "\n".join(out).strip() + "\n"
 
 
 def write_vtt(segs: List[Tuple[str, float]]) -> str:
-    t = 0.0
     out: List[str] = ["WEBVTT", ""]
-    for line, dur in segs:
-        out += [f"{_fmt_srt_ts(t).replace(',', '.')} --> {_fmt_srt_ts(t + dur).replace(',', '.')}", line, ""]
-        t += dur
+    append = out.append
+    for line, a, b in _timeline_ms(segs):
+        append(f"{_fmt_srt_ts(a).replace(',', '.')} --> {_fmt_srt_ts(b).replace(',', '.')}")
+        append(line)
+        append("")
     return "\n".join(out).strip() + "\n"
 
 
@@ -259,19 +274,17 @@ def write_ass(
     )
 
     # one line per segment; NO \N
-    t = 0.0
     events: List[str] = []
-    for line, dur in segs:
-        events.append(f"Dialogue: 0,{_fmt_ass_ts(t)},{_fmt_ass_ts(t+dur)},Default,,0,0,0,,{line}")
-        t += dur
+    for line, a, b in _timeline_ms(segs):
+        events.append(f"Dialogue: 0,{_fmt_ass_ts(a)},{_fmt_ass_ts(b)},Default,,0,0,0,,{line}")
 
     return header + "\n".join(events) + "\n"
 
 
 # ---------- video render with burn-in ----------
 
-def _run_ffmpeg(args: List[str]) -> None:
-    p = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+def _run_ffmpeg(args: List[str], stdin_bytes: Optional[bytes] = None) -> None:
+    p = subprocess.run(args, input=stdin_bytes, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
     if p.returncode != 0:
         raise RuntimeError(p.stderr.decode("utf-8", "ignore")[:1200])
 
@@ -286,42 +299,31 @@ def render_burned_mp4(
     # Ensure bottom-center and margins even if style is missing at runtime
     force_style: str = "Alignment=2,WrapStyle=2,MarginL=80,MarginR=80,MarginV=120",
 ) -> bytes:
-    a_suffix = ".wav" if audio_ext.lower() == "wav" else ".mp3"
-    afd, a_path = tempfile.mkstemp(suffix=a_suffix); os.write(afd, audio_bytes); os.close(afd)
+    a_fmt = "wav" if audio_ext.lower() == "wav" else "mp3"
     sfd, s_path = tempfile.mkstemp(suffix=".ass"); os.write(sfd, ass_text.encode("utf-8")); os.close(sfd)
-    v_path = a_path + ".mp4"
-
-    # get duration from ffprobe
-    probe = subprocess.run(
-        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nw=1:nk=1", a_path],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    if probe.returncode != 0:
-        raise RuntimeError("ffprobe failed for audio")
-    try:
-        dur = float(probe.stdout.decode().strip())
-        if not (dur > 0):
-            dur = 10.0
-    except Exception:
-        dur = 10.0
+    v_path = s_path + ".mp4"
 
-    # inputs first, then filter
+    # inputs first, then filter; audio arrives on stdin. The black source is bounded by
+    # the header-derived duration plus slack (no ffprobe pass), with -shortest as the
+    # second guard that trims it to the audio
+    dur = audio_duration(audio_bytes, a_fmt)
+    src = f"color=black:s={resolution}" + (f":d={dur + DURATION_SLACK_SEC:.3f}" if dur else "")
     _run_ffmpeg([
         "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
-        "-f", "lavfi", "-i", f"color=black:s={resolution}:d={dur}",
-        "-i", a_path,
+        "-f", "lavfi", "-i", src,
+        "-f", a_fmt, "-i", "pipe:0",
         "-vf", f"subtitles=filename='{s_path}':force_style='{force_style}'",
         "-c:v", "libx264", "-pix_fmt", "yuv420p",
         "-c:a", "aac",
         "-shortest",
         "-movflags", "+faststart",
         v_path
-    ])
+    ], stdin_bytes=audio_bytes)
 
     with open(v_path, "rb") as f:
         out = f.read()
 
-    for pth in (a_path, s_path, v_path):
+    for pth in (s_path, v_path):
         try:
             os.remove(pth)
         except Exception:
@@ -117,7 +117,8 @@ def api_generate_assets(
           "italic": False,
           "resolution": "1080x1920",
           "layout": "9:16"
-        }
+        },
+        "batch_mode": False
     }),
     _: None = Depends(single_user_guard),
 ):
@@ -150,6 +151,7 @@ def api_generate_assets(
             voice_id=voice_id,
             outputs=wanted,
             style=style,
+            batch_mode=bool(payload.get("batch_mode", False)),
         )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Generation failed: {e}")
@@ -0,0 +1,72 @@
+"""
+Vox-9 media info — cheap facts about audio buffers without spawning ffprobe.
+
+• audio_duration reads the length straight from WAV/MP3 headers.
+• Used to bound the black video source of the MP4 renders.
+"""
+from __future__ import annotations
+import struct
+from typing import Optional
+
+# renders bound their video source at duration + this, leaving -shortest to trim exactly
+DURATION_SLACK_SEC = 0.5
+
+# MPEG version bits -> (sample rates by index, samples per Layer III frame)
+_MP3_RATES = {
+    3: ((44100, 48000, 32000), 1152),   # MPEG-1
+    2: ((22050, 24000, 16000), 576),    # MPEG-2
+    0: ((11025, 12000, 8000), 576),     # MPEG-2.5
+}
+
+def _wav_duration(b: bytes) -> Optional[float]:
+    if len(b) < 12 or b[:4] != b"RIFF" or b[8:12] != b"WAVE":
+        return None
+    pos, byte_rate = 12, 0
+    while pos + 8 <= len(b):
+        cid, size = b[pos:pos + 4], struct.unpack_from("<I", b, pos + 4)[0]
+        if cid == b"fmt ":
+            if pos + 20 > len(b):
+                return None
+            byte_rate = struct.unpack_from("<I", b, pos + 16)[0]
+        elif cid == b"data":
+            # streamed WAVs may carry a placeholder size; clamp to what we actually have
+            size = min(size, len(b) - pos - 8)
+            return size / byte_rate if byte_rate else None
+        pos += 8 + size + (size & 1)
+    return None
+
+def _mp3_duration(b: bytes) -> Optional[float]:
+    pos = 0
+    if b[:3] == b"ID3" and len(b) >= 10:
+        pos = 10 + ((b[6] & 0x7F) << 21 | (b[7] & 0x7F) << 14 | (b[8] & 0x7F) << 7 | (b[9] & 0x7F))
+    pos = b.find(b"\xff", pos)
+    while 0 <= pos <= len(b) - 4:
+        h1, h2, h3 = b[pos + 1], b[pos + 2], b[pos + 3]
+        ver, layer, br_idx, sr_idx = (h1 >> 3) & 3, (h1 >> 1) & 3, h2 >> 4, (h2 >> 2) & 3
+        if h1 & 0xE0 == 0xE0 and layer == 1 and ver in _MP3_RATES and 0 < br_idx < 15 and sr_idx < 3:
+            break
+        pos = b.find(b"\xff", pos + 1)
+    else:
+        return None
+    rates, spf = _MP3_RATES[ver]
+    mono = (h3 >> 6) == 3
+    frames = None
+    # Xing/Info tag sits after the first frame's side info
+    xing = pos + 4 + ((17 if mono else 32) if ver == 3 else (9 if mono else 17))
+    if b[xing:xing + 4] in (b"Xing", b"Info") and xing + 12 <= len(b):
+        flags = struct.unpack_from(">I", b, xing + 4)[0]
+        if flags & 1:
+            frames = struct.unpack_from(">I", b, xing + 8)[0]
+    # VBRI tag (Fraunhofer encoders) sits at a fixed 32 bytes past the header
+    vbri = pos + 4 + 32
+    if frames is None and b[vbri:vbri + 4] == b"VBRI" and vbri + 18 <= len(b):
+        frames = struct.unpack_from(">I", b, vbri + 14)[0]
+    return frames * spf / rates[sr_idx] if frames else None
+
+def audio_duration(audio_bytes: bytes, ext: str) -> Optional[float]:
+    """
+    Duration in seconds read from the container header: WAV RIFF chunks, or an MP3's
+    Xing/Info/VBRI frame count. None if it can't be known without decoding (e.g. an MP3
+    with no such tag, where a bitrate guess could come out short on VBR input).
+    """
+    return _wav_duration(audio_bytes) if ext == "wav" else _mp3_duration(audio_bytes)
@@ -3,19 +3,34 @@ Vox-9 TTS engine — synced captions from text using ElevenLabs
 Now defaults to widescreen (1920x1080) and safe single-line captions.
 """
 
+import io
 import os
 import re
 import json
+import time
+import wave
+import hashlib
 import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import accumulate
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import Iterator, List, Dict, Tuple, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pydub import AudioSegment
+from pydub.silence import detect_nonsilent
 from pydub.utils import which
 
-AudioSegment.converter = which("ffmpeg")
-AudioSegment.ffprobe = which("ffprobe")
+# Pin absolute tool paths once; a re-import (e.g. reload) skips the PATH lookups
+if not os.path.isabs(AudioSegment.converter or ""):
+    AudioSegment.converter = which("ffmpeg")
+if not os.path.isabs(getattr(AudioSegment, "ffprobe", None) or ""):
+    AudioSegment.ffprobe = which("ffprobe")
 
 # ---------- Defaults ----------
 DEFAULT_FONT_NAME = "DejaVu Sans"   # safe in container; Calibri if provided
@@ -38,19 +53,54 @@ DEFAULT_PARAGRAPH_GAP_MS    = 600
 
 DEFAULT_RESOLUTION = "1920x1080"    # widescreen default
 
+DEFAULT_TTS_WORKERS = 6             # concurrent ElevenLabs requests (VOX9_TTS_WORKERS)
+BATCH_MIN_SILENCE_MS  = 250         # batch mode: pause length that separates sentences
+BATCH_SILENCE_DROP_DB = 14          # batch mode: silence = this many dB below average loudness
+BATCH_MAX_CHARS = 5000              # batch mode: per-request text cap (ElevenLabs' smallest model limit)
+
+CAPTION_WRITE_BUFFER = 1024 * 1024  # caption files stream through one 1 MB buffer
+
 ELEVEN_TTS_URL_TMPL = "https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-ASS_TAG_RE = re.compile(r"\{\\.*?\}")
+ELEVEN_RETRY_STATUSES = (429, 500, 502, 503, 504)
+STREAM_CHUNK_BYTES = 64 * 1024
+TTS_CACHE_MAX_MB = 1024             # synthesis cache cap before LRU eviction (VOX9_TTS_CACHE_MAX_MB)
+TTS_CACHE_PRUNE_INTERVAL = 60       # seconds between cache size checks per process
+# Sentences are requested as raw PCM at this rate (22050/24000 work on every plan; 44100 needs Pro)
+DEFAULT_PCM_RATE = 24000            # overridable with ELEVEN_PCM_RATE
 
 # ---------- Helpers ----------
+def _env_int(name: str, default: int) -> int:
+    """Integer setting from the environment, read at call time; unset or malformed -> default."""
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+def _pcm_rate() -> int:
+    return _env_int("ELEVEN_PCM_RATE", DEFAULT_PCM_RATE)
+
+# Any of these means clean_text has real work to do
+_DIRTY_WS_MARKERS = ("\r", "\t", "\f", "\v", "  ", " \n", "\n ", "\n\n\n")
+
+# One pass: a run of line breaks (any style, with surrounding blanks) keeps at most
+# one empty line; any other run of blanks becomes a single space.
+_CLEAN_WS_RE = re.compile(r"(?:[ \t\f\v]*(?:\r\n|\r|\n))+[ \t\f\v]*|[ \t\f\v]+")
+_SENT_SPLIT_RE = re.compile(r"(?<=[\.!?])\s+")
+
+def _clean_ws_repl(m: "re.Match[str]") -> str:
+    run = m.group(0)
+    breaks = run.count("\n") + run.count("\r") - run.count("\r\n")
+    return "\n" * min(breaks, 2) if breaks else " "
+
 def clean_text(raw: str) -> str:
-    t = raw.replace("\r\n", "\n").replace("\r", "\n")
-    t = re.sub(r"\t+", " ", t)
-    t = re.sub(r"[ \t\f\v]+", " ", t)
-    t = re.sub(r"[ \t\f\v]*\n[ \t\f\v]*", "\n", t)
-    t = re.sub(r"\n{3,}", "\n\n", t)
+    # Fast path: already-normalised ASCII text comes back unchanged
+    if raw.isascii() and raw == raw.strip() and not any(m in raw for m in _DIRTY_WS_MARKERS):
+        return raw
+    t = _CLEAN_WS_RE.sub(_clean_ws_repl, raw)
     lines = [ln.strip() for ln in t.split("\n")]
     return "\n".join(lines).strip()
 
+@lru_cache(maxsize=16)
 def _parse_resolution(res: str) -> Tuple[int,int]:
     try:
         w, h = res.lower().split("x")
@@ -58,45 +108,43 @@ def _parse_resolution(res: str) -> Tuple[int,int]:
     except Exception:
         return (1920, 1080)
 
-def format_ts(seconds: float) -> str:
-    seconds = max(0.0, seconds)
-    h = int(seconds // 3600); m = int((seconds % 3600) // 60); s = int(seconds % 60)
-    cs = int(round((seconds - int(seconds)) * 100))
-    return f"{h}:{m:02d}:{s:02d}.{cs:02d}"
-
-def ass_to_ms(ts_ass: str) -> int:
-    try:
-        h, m, s_cs = ts_ass.split(":")
-        s, cs = s_cs.split(".")
-        return ((int(h)*3600 + int(m)*60 + int(s)) * 1000) + int(cs)*10
-    except Exception:
-        return 0
+def split_hms(ms: int) -> Tuple[int, int, int, int]:
+    """Integer ms -> (h, m, s, ms) in one divmod cascade; every caption format renders from this."""
+    s_total, rem = divmod(max(0, int(ms)), 1000)
+    m_total, s = divmod(s_total, 60)
+    h, m = divmod(m_total, 60)
+    return h, m, s, rem
 
-def ms_to_srt(ms: int) -> str:
-    ms = max(0, int(ms))
-    h = ms // 3_600_000; m = (ms % 3_600_000) // 60_000; s = (ms % 60_000) // 1000; rem = ms % 1000
-    return f"{h:02d}:{m:02d}:{s:02d},{rem:03d}"
+def ass_of(h: int, m: int, s: int, ms: int) -> str:
+    """ASS timestamp (H:MM:SS.cc) from split_hms parts; centiseconds are truncated."""
+    return f"{h}:{m:02d}:{s:02d}.{ms // 10:02d}"
 
-def normalize_caption_text(txt: str) -> str:
-    return ASS_TAG_RE.sub("", txt.replace("\\N", "\n")).strip()
+def srt_of(h: int, m: int, s: int, ms: int, sep: str = ",") -> str:
+    """SRT timestamp (HH:MM:SS,mmm) from split_hms parts; sep="." gives the VTT form."""
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{ms:03d}"
 
 # ---------- Sentence splitting ----------
 _NON_TERMINAL_ABBREVIATIONS = {"mr.", "mrs."}
 _COMMON_STARTERS = {"a","an","and","but","he","she","it","i","you","we","they","the","there","these","those","this"}
 
+_STARTER_SCAN = max(map(len, _COMMON_STARTERS)) + 1
+
+# Both checks look only at the edge of the string rather than splitting it into words
 def _ends_with_abbrev(s: str) -> bool:
     if not s: return False
-    last = s.rstrip().split()
-    if not last: return False
-    token = last[-1].rstrip("\"'”’)]}")
-    return token.lower() in _NON_TERMINAL_ABBREVIATIONS
+    t = s.rstrip().rstrip("\"'”’)]}")
+    for abbrev in _NON_TERMINAL_ABBREVIATIONS:
+        n = len(abbrev)
+        if t[-n:].lower() == abbrev and (len(t) == n or t[-n - 1].isspace()):
+            return True
+    return False
 
 def _starts_like_new_sentence(part: str) -> bool:
     if not part: return False
-    w = part.split()
-    if not w: return False
-    first = w[0].lstrip("\"'“”‘’([{").lower()
-    return first in _COMMON_STARTERS
+    head = part.lstrip().lstrip("\"'“”‘’([{")[:_STARTER_SCAN]
+    if not head or head[0].isspace():
+        return False
+    return head.split(None, 1)[0].lower() in _COMMON_STARTERS
 
 def split_into_sentences(text: str) -> List[Tuple[str, bool]]:
     paras = text.split("\n\n")
@@ -106,7 +154,7 @@ def split_into_sentences(text: str) -> List[Tuple[str, bool]]:
         p = para.strip()
         if not p:
             continue
-        parts = re.split(r"(?<=[\.!?])\s+", p)
+        parts = _SENT_SPLIT_RE.split(p)
         first_in_para = True
         for part in parts:
             part = part.strip()
@@ -122,21 +170,28 @@ def split_into_sentences(text: str) -> List[Tuple[str, bool]]:
     return out
 
 # ---------- Simple wrap (safe defaults like Tk) ----------
+def _wrap_words_to_lines(words: List[str], max_chars: int) -> List[str]:
+    lines: List[str] = []
+    cur: List[str] = []
+    cur_len = 0
+    for w in words:
+        wl = len(w)
+        needed = wl + 1 if cur else wl
+        if cur and cur_len + needed > max_chars:
+            lines.append(" ".join(cur)); cur = [w]; cur_len = wl
+        else:
+            cur.append(w); cur_len += needed
+    if cur:
+        lines.append(" ".join(cur))
+    return lines
+
 def split_text_for_events(text: str, max_chars: int, max_lines: int) -> list:
     words = text.split()
     if not words:
         return [""]
-    lines = []
-    line = ""
-    for w in words:
-        candidate = (line + " " + w).strip()
-        if len(candidate) <= max_chars or not line:
-            line = candidate
-        else:
-            lines.append(line)
-            line = w
-    if line:
-        lines.append(line)
+    lines = _wrap_words_to_lines(words, max_chars)
+    if max_lines == 1:
+        return lines or [""]
     # group into single-line events (or multiple sequential if long)
     segs = []
     for i in range(0, len(lines), max_lines):
@@ -169,19 +224,62 @@ def write_ass(sub_path: Path, events: list, *, font_name: str, font_size: int,
         f"{outline},{shadow},{alignment},{margin_l},{margin_r},{margin_v},0"
     )
     events_hdr = "\n[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text"
-    lines = [header + style + events_hdr]
-    for ev in events:
-        lines.append(f"Dialogue: 0,{ev['start']},{ev['end']},Default,,0,0,0,,{ev['text']}")
-    sub_path.write_text("\n".join(lines), encoding="utf-8")
+    with sub_path.open("w", encoding="utf-8", buffering=CAPTION_WRITE_BUFFER) as f:
+        f.write(header + style + events_hdr + "\n")
+        f.writelines(f"Dialogue: 0,{ev['start']},{ev['end']},Default,,0,0,0,,{ev['text']}\n" for ev in events)
+
+# ---------- Silence ----------
+def _pcm_bytes(ms: int, sample: AudioSegment) -> int:
+    """Byte length of `ms` of audio in `sample`'s format, whole frames only."""
+    return int(ms * sample.frame_rate / 1000) * sample.frame_width
+
+# ---------- Export audio ----------
+_PCM_FORMATS = {1: "u8", 2: "s16le", 3: "s24le", 4: "s32le"}
+
+def _export_wav_and_mp3(audio: AudioSegment, wav_path: Path, mp3_path: Path) -> bool:
+    """
+    Encode WAV + MP3 in a single ffmpeg run, feeding the raw PCM once over stdin.
+    Returns False if the combined encode failed (caller falls back to pydub export).
+    """
+    fmt = _PCM_FORMATS.get(audio.sample_width)
+    if not fmt or not AudioSegment.converter:
+        return False
+    args = [
+        AudioSegment.converter, "-y", "-hide_banner", "-loglevel", "error",
+        "-f", fmt, "-ar", str(audio.frame_rate), "-ac", str(audio.channels), "-i", "pipe:0",
+        "-c:a", f"pcm_{fmt}", str(wav_path),
+        "-c:a", "libmp3lame", "-b:a", "128k", str(mp3_path),   # same 128k CBR as pydub's export
+    ]
+    try:
+        proc = subprocess.run(args, input=audio.raw_data, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except OSError:
+        return False
+    return proc.returncode == 0
 
 # ---------- ElevenLabs ----------
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    # Ride out transient throttling / 5xx instead of failing the whole batch
+    retry = Retry(
+        total=5, backoff_factor=0.5, status_forcelist=ELEVEN_RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "POST"}), respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry))
+    return session
+
+# Shared keep-alive pool: TLS handshakes are paid once per connection, not per call.
+# The API key travels per request so no credentials live on the shared session.
+_SESSION = _make_session()
+
 class ElevenAPI:
     def __init__(self, api_key: str):
-        self.session = requests.Session()
-        self.session.headers.update({"xi-api-key": api_key})
+        self.session = _SESSION
+        self.headers = {"xi-api-key": api_key}
 
-    def synth_sentence(self, voice_id: str, text: str, *, model_id: str,
-                       stability: float = 0.5, similarity: float = 0.75, speaking_rate: float = 1.0) -> bytes:
+    def _post(self, voice_id: str, text: str, *, model_id: str,
+              stability: float = 0.5, similarity: float = 0.75, speaking_rate: float = 1.0,
+              output_format: str = "mp3_44100_128", stream: bool = False) -> requests.Response:
         url = ELEVEN_TTS_URL_TMPL.format(voice_id=voice_id)
         payload = {
             "text": text,
@@ -192,9 +290,206 @@ class ElevenAPI:
                 "speaking_rate": float(speaking_rate),
             },
         }
-        r = self.session.post(url, json=payload, headers={"Accept": "audio/mpeg"}, timeout=120)
+        accept = "audio/pcm" if output_format.startswith("pcm_") else "audio/mpeg"
+        r = self.session.post(url, params={"output_format": output_format}, json=payload,
+                              headers={**self.headers, "Accept": accept}, stream=stream, timeout=120)
         r.raise_for_status()
-        return r.content
+        return r
+
+    def synth_sentence(self, voice_id: str, text: str, **kwargs) -> bytes:
+        return self._post(voice_id, text, **kwargs).content
+
+    def synth_stream(self, voice_id: str, text: str, **kwargs) -> Iterator[bytes]:
+        """Yield the audio body chunk by chunk as it arrives."""
+        with self._post(voice_id, text, stream=True, **kwargs) as r:
+            yield from r.iter_content(chunk_size=STREAM_CHUNK_BYTES)
+
+    def synth_to_file(self, dest_path: Path, voice_id: str, text: str, **kwargs) -> None:
+        """Stream the audio into `dest_path` chunk by chunk instead of buffering the whole body."""
+        with open(dest_path, "wb") as f:
+            f.writelines(self.synth_stream(voice_id, text, **kwargs))
+
+def _cache_dir() -> Path:
+    return Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "vox9"
+
+def _tts_cache_root() -> Path:
+    return Path(os.getenv("VOX9_TTS_CACHE") or _cache_dir() / "tts").expanduser()
+
+def _tts_cache_path(voice_id: str, text: str, **kwargs) -> Path:
+    """Content-addressed cache file for one synthesis (voice, settings, format and text)."""
+    parts = [voice_id, *(f"{k}={kwargs[k]}" for k in sorted(kwargs)), text]
+    key = hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+    ext = str(kwargs.get("output_format", "mp3_44100_128")).split("_", 1)[0]   # pcm_24000 -> pcm
+    return _tts_cache_root() / key[:2] / f"{key}.{ext}"
+
+_TTS_CACHE_ENTRY_GLOB = "[0-9a-f]" * 2 + "/" + "[0-9a-f]" * 64 + ".*"
+
+def _prune_tts_cache(root: Path, max_bytes: int) -> None:
+    """Evict least recently used entries (hits refresh mtime) until under 90% of max_bytes."""
+    entries = []
+    total = 0
+    # Only our own <2 hex>/<sha256>.<ext> entries; in-flight mkstemp files and anything
+    # else that shares the directory are left alone
+    for p in root.glob(_TTS_CACHE_ENTRY_GLOB):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, p))
+        total += st.st_size
+    if total <= max_bytes:
+        return
+    entries.sort()
+    for _, size, p in entries:
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            p.unlink()
+            total -= size
+        except OSError:
+            pass
+
+_last_prune = float("-inf")
+_prune_lock = threading.Lock()
+
+def _maybe_prune_tts_cache() -> None:
+    """Run _prune_tts_cache at most once per TTS_CACHE_PRUNE_INTERVAL, from one thread at a time."""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < TTS_CACHE_PRUNE_INTERVAL or not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _last_prune = now
+        max_mb = _env_int("VOX9_TTS_CACHE_MAX_MB", TTS_CACHE_MAX_MB)
+        _prune_tts_cache(_tts_cache_root(), max_mb * 1024 * 1024)
+    finally:
+        _prune_lock.release()
+
+def _cached_synth(eleven: ElevenAPI, voice_id: str, text: str, **kwargs) -> bytes:
+    """synth_sentence through the on-disk cache, so re-renders only pay for edited sentences."""
+    path = _tts_cache_path(voice_id, text, **kwargs)
+    try:
+        data = path.read_bytes()
+    except OSError:
+        pass
+    else:
+        try:
+            os.utime(path)   # mark as recently used for eviction
+        except OSError:
+            pass
+        return data
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+    except OSError:
+        return eleven.synth_sentence(voice_id, text, **kwargs)
+    # Stream the response into the cache's temp file, then publish it with a rename
+    tmp = Path(tmp_name)
+    try:
+        eleven.synth_to_file(tmp, voice_id, text, **kwargs)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    data = path.read_bytes()
+    _maybe_prune_tts_cache()
+    return data
+
+def _synth_pcm(eleven: ElevenAPI, voice_id: str, text: str, **kwargs) -> AudioSegment:
+    """Synthesise one sentence as raw 16-bit mono PCM; wrapping it needs no decoder at all."""
+    rate = _pcm_rate()
+    pcm = _cached_synth(eleven, voice_id, text, output_format=f"pcm_{rate}", **kwargs)
+    pcm = pcm[:len(pcm) - len(pcm) % 2]   # whole samples only
+    return AudioSegment(data=pcm, sample_width=2, frame_rate=rate, channels=1)
+
+ELEVEN_MP3_FORMAT = "mp3_44100_128"
+
+def pcm_to_wav(pcm: bytes, frame_rate: int) -> bytes:
+    """Wrap raw 16-bit mono PCM in a WAV header, in memory."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1); w.setsampwidth(2); w.setframerate(frame_rate)
+        w.writeframes(pcm[:len(pcm) - len(pcm) % 2])
+    return buf.getvalue()
+
+def synthesize_elevenlabs(text: str, voice_id: Optional[str] = None, *, out_format: str = "mp3") -> bytes:
+    """
+    One-shot synthesis of `text` (used by the scaffold pipeline).
+    out_format: 'mp3' -> MP3 bytes; 'wav' -> 16-bit mono WAV wrapped in-process from PCM.
+    """
+    fmt = (out_format or "mp3").lower()
+    if fmt not in ("mp3", "wav"):
+        raise ValueError(f"Unsupported out_format: {out_format}")
+    api_key, voice_id, model_id = _oneshot_settings(voice_id)
+    rate = _pcm_rate()
+    # Through the disk cache: re-rendering the same script and voice skips the network
+    audio = _cached_synth(ElevenAPI(api_key), voice_id, text, model_id=model_id,
+                          output_format=f"pcm_{rate}" if fmt == "wav" else ELEVEN_MP3_FORMAT)
+    return pcm_to_wav(audio, rate) if fmt == "wav" else audio
+
+def synthesize_elevenlabs_stream(text: str, voice_id: Optional[str] = None) -> Iterator[bytes]:
+    """
+    MP3 for `text` as an iterator of response chunks, for consumers that can start on
+    partial audio (e.g. piping into ffmpeg). Uncached: the body is never held whole.
+    """
+    api_key, voice_id, model_id = _oneshot_settings(voice_id)
+    return ElevenAPI(api_key).synth_stream(voice_id, text, model_id=model_id,
+                                           output_format=ELEVEN_MP3_FORMAT)
+
+def _oneshot_settings(voice_id: Optional[str]) -> Tuple[str, str, str]:
+    """(api_key, voice_id, model_id) for the one-shot helpers, from args and env."""
+    api_key = os.getenv("ELEVEN_API_KEY")
+    if not api_key:
+        raise RuntimeError("ELEVEN_API_KEY is missing")
+    voice_id = voice_id or os.getenv("ELEVEN_VOICE_ID") or DEFAULT_FAVORITE_VOICES[0][1]
+    return api_key, voice_id, os.getenv("ELEVEN_MODEL_ID", "eleven_multilingual_v2")
+
+def _batch_groups(sentences: List[str], max_chars: int = BATCH_MAX_CHARS) -> List[List[int]]:
+    """Consecutive sentence indices packed into requests of at most `max_chars` characters."""
+    groups: List[List[int]] = []
+    size = max_chars + 1
+    for i, sentence in enumerate(sentences):
+        if size + 1 + len(sentence) > max_chars:
+            groups.append([])
+            size = -1
+        groups[-1].append(i)
+        size += 1 + len(sentence)
+    return groups
+
+def _split_on_pauses(full: AudioSegment, expected: int) -> Optional[List[AudioSegment]]:
+    """
+    Cut `full` into `expected` sentences at its longest pauses (extra pauses from commas and
+    breaths are left inside sentences). None if it is silent or has too few pauses.
+    """
+    if full.dBFS == float("-inf"):
+        return None
+    spans = detect_nonsilent(full, min_silence_len=BATCH_MIN_SILENCE_MS,
+                             silence_thresh=full.dBFS - BATCH_SILENCE_DROP_DB)
+    if len(spans) < expected:
+        return None
+    gaps = sorted(range(len(spans) - 1), key=lambda i: spans[i + 1][0] - spans[i][1], reverse=True)
+    cuts = sorted(gaps[:expected - 1])
+    starts = [spans[0][0]] + [spans[i + 1][0] for i in cuts]
+    ends = [spans[i][1] for i in cuts] + [spans[-1][1]]
+    return [full[a:b] for a, b in zip(starts, ends)]
+
+def _synth_batch(eleven: ElevenAPI, voice_id: str, sentences: List[str], **kwargs) -> List[Optional[AudioSegment]]:
+    """
+    Synthesise the story a few thousand characters per request, then cut each request's
+    audio back into sentences on its pauses. Sentences whose request failed or couldn't be
+    cut come back as None, for the caller to synthesise one by one.
+    """
+    chunks: List[Optional[AudioSegment]] = [None] * len(sentences)
+    for group in _batch_groups(sentences):
+        try:
+            full = _synth_pcm(eleven, voice_id, " ".join(sentences[i] for i in group), **kwargs)
+        except requests.RequestException:
+            continue
+        parts = _split_on_pauses(full, len(group))
+        if parts is not None:
+            for i, part in zip(group, parts):
+                chunks[i] = part
+    return chunks
 
 # ---------- Generate assets ----------
 def generate_assets_from_story(
@@ -212,6 +507,7 @@ def generate_assets_from_story(
     bold: bool = True,
     italic: bool = False,
     resolution: str = DEFAULT_RESOLUTION,
+    batch_mode: bool = False,
 ) -> Dict[str, str]:
     api_key = os.getenv("ELEVEN_API_KEY")
     if not api_key:
@@ -223,72 +519,100 @@ def generate_assets_from_story(
     if not pieces:
         raise RuntimeError("No sentences found")
 
-    tmp = Path(tempfile.mkdtemp(prefix="vox9_tts_"))
-    chunks: List[AudioSegment] = []
-    durations: List[float] = []
-    for idx, (sentence, _) in enumerate(pieces, 1):
-        mp3 = eleven.synth_sentence(
-            voice_id, sentence, model_id=model_id,
-            stability=stability, similarity=similarity_boost, speaking_rate=speaking_rate
-        )
-        mp3_path = tmp / f"chunk_{idx:04d}.mp3"
-        mp3_path.write_bytes(mp3)
-        seg = AudioSegment.from_file(mp3_path, format="mp3")
-        chunks.append(seg)
-        durations.append(len(seg) / 1000.0)
-
-    # Join all audio
-    full = AudioSegment.silent(duration=DEFAULT_LEAD_IN_MS)
+    synth_kwargs = dict(model_id=model_id, stability=stability,
+                        similarity=similarity_boost, speaking_rate=speaking_rate)
+    chunks: List[Optional[AudioSegment]] = [None] * len(pieces)
+    if batch_mode:
+        chunks = _synth_batch(eleven, voice_id, [sentence for sentence, _ in pieces], **synth_kwargs)
+    missing = [i for i, seg in enumerate(chunks) if seg is None]
+    if missing:
+        workers = max(1, _env_int("VOX9_TTS_WORKERS", DEFAULT_TTS_WORKERS))
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = [ex.submit(_synth_pcm, eleven, voice_id, pieces[i][0], **synth_kwargs)
+                       for i in missing]
+            # Collect in story order; requests above are already in flight
+            try:
+                for i, fut in zip(missing, futures):
+                    chunks[i] = fut.result()
+            except BaseException:
+                # Don't send (and pay for) queued sentences once the story has failed
+                ex.shutdown(wait=False, cancel_futures=True)
+                raise
+    durations_ms: List[int] = [len(seg) for seg in chunks]
+
+    # Join all audio into one preallocated PCM buffer (zero bytes == silence)
+    first = chunks[0]
+    chunks = [
+        seg.set_frame_rate(first.frame_rate).set_channels(first.channels).set_sample_width(first.sample_width)
+        for seg in chunks
+    ]
+    lead_bytes = _pcm_bytes(DEFAULT_LEAD_IN_MS, first)
+    gap_bytes = _pcm_bytes(DEFAULT_GAP_MS, first)
+    buf = bytearray(lead_bytes + sum(len(seg.raw_data) + gap_bytes for seg in chunks))
+    view = memoryview(buf)
+    offset = lead_bytes
     for seg in chunks:
-        full += seg + AudioSegment.silent(duration=DEFAULT_GAP_MS)
+        data = seg.raw_data
+        view[offset:offset + len(data)] = data
+        offset += len(data) + gap_bytes
+    view.release()
+    full = AudioSegment(data=bytes(buf), sample_width=first.sample_width,
+                        frame_rate=first.frame_rate, channels=first.channels)
 
     # Export audio
     output_dir.mkdir(parents=True, exist_ok=True)
     stem = "narration"
     wav_path = output_dir / f"{stem}.wav"
     mp3_path = output_dir / f"{stem}.mp3"
-    full.export(wav_path, format="wav")
-    try:
-        full.export(mp3_path, format="mp3")
-    except Exception:
-        mp3_path = None
-
-    # Build caption events
-    t = DEFAULT_LEAD_IN_MS / 1000.0
+    if not _export_wav_and_mp3(full, wav_path, mp3_path):
+        # Fallback: pydub writes the WAV in-process; only the MP3 needs ffmpeg
+        full.export(wav_path, format="wav")
+        try:
+            full.export(mp3_path, format="mp3")
+        except Exception:
+            mp3_path = None
+
+    # Build caption events on an integer-ms timeline: sentence starts come from one
+    # running sum (no float drift over long stories); every line spans its sentence
+    starts_ms = accumulate((d + DEFAULT_GAP_MS for d in durations_ms[:-1]), initial=DEFAULT_LEAD_IN_MS)
     events = []
-    for (sentence, _), dur in zip(pieces, durations):
-        sentence_start = t
-        sentence_end = sentence_start + dur
-        seg_texts = split_text_for_events(sentence, max_chars_per_line, 1)
-        for seg_text in seg_texts:
+    for (sentence, _), start_ms, dur_ms in zip(pieces, starts_ms, durations_ms):
+        a_hms = split_hms(start_ms)
+        b_hms = split_hms(start_ms + max(dur_ms, 10))   # never a zero-length cue
+        for seg_text in split_text_for_events(sentence, max_chars_per_line, 1):
             events.append({
-                "start": format_ts(sentence_start),
-                "end": format_ts(sentence_end),
+                "start": ass_of(*a_hms),
+                "end": ass_of(*b_hms),
+                "start_hms": a_hms,
+                "end_hms": b_hms,
                 "text": seg_text,
             })
-        t = sentence_end + DEFAULT_GAP_MS / 1000.0
 
     # Write captions
     ass_path = output_dir / f"{stem}.ass"
     srt_path = output_dir / f"{stem}.srt"
+    vtt_path = output_dir / f"{stem}.vtt"
     write_ass(ass_path, events, font_name=font_name, font_size=font_size,
               bold=bold, italic=italic, outline=DEFAULT_OUTLINE, shadow=DEFAULT_SHADOW,
               alignment=DEFAULT_ALIGNMENT, margin_v=DEFAULT_MARGIN_V,
               margin_l=DEFAULT_MARGIN_L, margin_r=DEFAULT_MARGIN_R,
               resolution=resolution)
 
-    # SRT simple
-    out_srt = []
-    for i, ev in enumerate(events, 1):
-        a = ass_to_ms(ev["start"]); b = ass_to_ms(ev["end"]); b = max(b, a+10)
-        out_srt += [str(i), f"{ms_to_srt(a)} --> {ms_to_srt(b)}", normalize_caption_text(ev["text"]), ""]
-    srt_path.write_text("\n".join(out_srt), encoding="utf-8")
+    # SRT + VTT in one pass (events carry plain text and pre-split times, no ASS re-parse)
+    with srt_path.open("w", encoding="utf-8", buffering=CAPTION_WRITE_BUFFER) as f_srt, \
+         vtt_path.open("w", encoding="utf-8", buffering=CAPTION_WRITE_BUFFER) as f_vtt:
+        f_vtt.write("WEBVTT\n\n")
+        for i, ev in enumerate(events, 1):
+            a_hms = ev["start_hms"]; b_hms = ev["end_hms"]
+            f_srt.write(f"{i}\n{srt_of(*a_hms)} --> {srt_of(*b_hms)}\n{ev['text']}\n\n")
+            f_vtt.write(f"{srt_of(*a_hms, '.')} --> {srt_of(*b_hms, '.')}\n{ev['text']}\n\n")
 
     return {
         "wav": str(wav_path),
         "mp3": str(mp3_path) if mp3_path else "",
         "ass": str(ass_path),
         "srt": str(srt_path),
+        "vtt": str(vtt_path),
     }
 
 # ---------- Voice listing ----------
@@ -301,15 +625,57 @@ DEFAULT_FAVORITE_VOICES = [
     ("Brian", "nPczCjzI2devNBz1zQrb"),
 ]
 
+ELEVEN_VOICES_URL = "https://api.elevenlabs.io/v1/voices"
+VOICES_CACHE_TTL = 3600             # seconds a cached voice list is served without a request
+
+def _read_json(path: Path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def _cached_get(url: str, headers: Dict[str, str], cache_file: Path, ttl: int = VOICES_CACHE_TTL):
+    """
+    GET a JSON document through a small on-disk cache.
+    A fresh copy skips the network; if the request fails, a stale copy is served instead.
+    """
+    try:
+        if time.time() - cache_file.stat().st_mtime < ttl:
+            return _read_json(cache_file)
+    except (OSError, ValueError):
+        pass
+    try:
+        r = _SESSION.get(url, headers=headers, timeout=30)
+        r.raise_for_status()
+        data = r.json()
+    except Exception:
+        if cache_file.exists():
+            try:
+                return _read_json(cache_file)
+            except (OSError, ValueError):
+                pass
+        raise
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Per-writer temp file, so concurrent refreshes can't interleave partial writes
+        fd, tmp_name = tempfile.mkstemp(dir=cache_file.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_name, cache_file)
+        finally:
+            Path(tmp_name).unlink(missing_ok=True)
+    except OSError:
+        pass
+    return data
+
 def list_voices():
     api_key = os.getenv("ELEVEN_API_KEY")
     hdrs = {"xi-api-key": api_key} if api_key else {}
     try:
         if not api_key:
             raise RuntimeError("no key")
-        r = requests.get("https://api.elevenlabs.io/v1/voices", headers=hdrs, timeout=30)
-        r.raise_for_status()
-        data = r.json() or {}; voices = data.get("voices") or []
+        # One cache file per account so switching keys never shows another account's voices
+        key_tag = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+        data = _cached_get(ELEVEN_VOICES_URL, hdrs, _cache_dir() / f"voices_{key_tag}.json")
+        data = data or {}; voices = data.get("voices") or []
         out = [{"name": (v.get("name") or "Unnamed").strip(), "voice_id": (v.get("voice_id") or "").strip()}
                for v in voices if (v.get("voice_id") or "").strip()]
         return {"voices": out or [{"name": n, "voice_id": vid} for (n, vid) in DEFAULT_FAVORITE_VOICES]}
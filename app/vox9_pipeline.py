@@ -6,76 +6,136 @@ Scaffold pipeline for Vox-9 assets.
 Swap these implementations for your real tkinter logic later.
 """
 from __future__ import annotations
-import os
+import asyncio
+import io
 import re
-import tempfile
 import subprocess
-from typing import Dict, Optional, List, Tuple
+import textwrap
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, Iterable, Optional, List, Tuple
+
+from app.media_info import DURATION_SLACK_SEC, audio_duration
+from app.tts import (
+    ass_of, pcm_to_wav, split_hms, srt_of, synthesize_elevenlabs, synthesize_elevenlabs_stream,
+)
 
-from app.tts import synthesize_elevenlabs
+# synthesize_elevenlabs(out_format="mp3") asks ElevenLabs for mp3_44100_128 (mono)
+EL_MP3_RATE = 44100
 
 # ---------- helpers
 
-def _run_ffmpeg(args: List[str]) -> None:
-    """Run ffmpeg and raise with stderr on failure."""
-    proc = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+def _run_ffmpeg(args: List[str], stdin_bytes: Optional[bytes] = None) -> bytes:
+    """Run ffmpeg (optionally feeding stdin) and raise with stderr on failure; returns stdout."""
+    proc = subprocess.run(args, input=stdin_bytes, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     if proc.returncode != 0:
         err = proc.stderr.decode("utf-8", "ignore")
         raise RuntimeError(f"ffmpeg failed: {err[:1000]}")
+    return proc.stdout
+
+def _run_ffmpeg_streaming(args: List[str], chunks: Iterable[bytes]) -> bytes:
+    """
+    _run_ffmpeg with stdin fed from an iterator as chunks arrive, so ffmpeg starts work
+    before the input is complete. stdout is collected here; stdin and stderr get threads.
+    """
+    proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
-def _write_temp_bytes(suffix: str, data: bytes) -> str:
-    fd, path = tempfile.mkstemp(suffix=suffix)
-    try:
-        os.write(fd, data)
-    finally:
-        os.close(fd)
-    return path
+    def feed() -> None:
+        try:
+            for chunk in chunks:
+                proc.stdin.write(chunk)
+        except BrokenPipeError:
+            pass   # ffmpeg exited early; its stderr says why
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
 
-def _read_file(path: str) -> bytes:
-    with open(path, "rb") as f:
-        return f.read()
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f_feed = ex.submit(feed)
+        f_err = ex.submit(proc.stderr.read)
+        out = proc.stdout.read()
+        err = f_err.result()
+        proc.wait()
+        f_feed.result()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {err.decode('utf-8', 'ignore')[:1000]}")
+    return out
+
+async def _run_ffmpeg_async(args: List[str], stdin_bytes: Optional[bytes] = None) -> bytes:
+    """_run_ffmpeg for async callers: the event loop keeps serving while ffmpeg runs."""
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.PIPE if stdin_bytes is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await proc.communicate(stdin_bytes)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {err.decode('utf-8', 'ignore')[:1000]}")
+    return out
 
 # ---------- captions (very basic placeholder)
 
+_SEG_RE = re.compile(r"[.\n]+")
+SEG_WORDS_PER_SEC = 2.5
+SEG_MIN_SEC, SEG_MAX_SEC = 1.2, 7.0
+SEG_MAX_LINE_CHARS, SEG_MAX_LINES = 42, 2
+
+def _wrap_cue(txt: str) -> List[str]:
+    return textwrap.wrap(txt, SEG_MAX_LINE_CHARS, break_long_words=False) or [txt]
+
+def _even_chunks(words: List[str], n: int) -> List[str]:
+    return [" ".join(words[k * len(words) // n:(k + 1) * len(words) // n]) for k in range(n)]
+
 def _estimate_segments(text: str) -> List[Tuple[str, float]]:
     """
-    Silly segmentation: split on newlines/periods, duration ~ by length.
+    Silly segmentation: split on newlines/periods, duration ~ words at a steady pace.
+    Only a sentence too long for one cue is cut, into the fewest near-equal chunks that
+    each fit the SEG_MAX_SEC clamp and wrap to at most SEG_MAX_LINES lines.
     Replace with your real alignment later.
     """
-    chunks = [c.strip() for c in re.split(r"[.\n]+", text) if c.strip()]
+    max_words = int(SEG_MAX_SEC * SEG_WORDS_PER_SEC)
     segs: List[Tuple[str, float]] = []
-    for c in chunks:
-        dur = max(1.5, min(6.0, 0.35 * (len(c) / 8)))  # crude
-        segs.append((c, float(dur)))
+    for c in _SEG_RE.split(text):
+        words = c.split()
+        if not words:
+            continue
+        n = -(-len(words) // max_words)   # chunks needed, sized evenly (no 1-word tails)
+        chunks = _even_chunks(words, n)
+        # long words can overflow two 42-char lines well under the word cap; one word per
+        # chunk always fits, so this stops by n == len(words)
+        while any(len(_wrap_cue(p)) > SEG_MAX_LINES for p in chunks):
+            n += 1
+            chunks = _even_chunks(words, n)
+        for part in chunks:
+            dur = max(SEG_MIN_SEC, min(SEG_MAX_SEC, len(part.split()) / SEG_WORDS_PER_SEC))
+            segs.append((part, dur))
     return segs or [("...", 2.0)]
 
-def _fmt_srt_ts(sec: float) -> str:
-    h = int(sec // 3600)
-    m = int((sec % 3600) // 60)
-    s = int(sec % 60)
-    ms = int((sec - int(sec)) * 1000)
-    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
-
 def make_captions_from_text(text: str) -> Dict[str, str]:
     segs = _estimate_segments(text)
 
-    # SRT
-    t = 0.0
-    srt_lines: List[str] = []
-    for i, (txt, dur) in enumerate(segs, start=1):
-        srt_lines += [str(i), f"{_fmt_srt_ts(t)} --> {_fmt_srt_ts(t+dur)}", txt, ""]
-        t += dur
-    srt = "\n".join(srt_lines).strip() + "\n"
-
-    # VTT
-    t = 0.0
-    vtt_lines: List[str] = ["WEBVTT", ""]
-    for txt, dur in segs:
-        start = _fmt_srt_ts(t).replace(",", ".")
-        end = _fmt_srt_ts(t + dur).replace(",", ".")
-        vtt_lines += [f"{start} --> {end}", txt, ""]
-        t += dur
-    vtt = "\n".join(vtt_lines).strip() + "\n"
+    # SRT + VTT + ASS events in one pass, each written straight into its own buffer; each
+    # boundary is split once and a segment's end split is reused as the next one's start
+    srt_buf, vtt_buf, ass_buf = io.StringIO(), io.StringIO(), io.StringIO()
+    vtt_buf.write("WEBVTT\n\n")
+    # boundaries live on an integer-ms timeline: durations are converted once and summed
+    # exactly, so no float error builds up over long transcripts
+    ends_ms = accumulate(round(dur * 1000) for _, dur in segs)
+    a = split_hms(0)
+    for i, ((txt, _), end_ms) in enumerate(zip(segs, ends_ms), 1):
+        b = split_hms(end_ms)
+        lines = _wrap_cue(txt)
+        txt, ass_txt = "\n".join(lines), "\\N".join(lines)
+        srt_buf.write(f"{i}\n{srt_of(*a)} --> {srt_of(*b)}\n{txt}\n\n")
+        vtt_buf.write(f"{srt_of(*a, '.')} --> {srt_of(*b, '.')}\n{txt}\n\n")
+        ass_buf.write(f"Dialogue: 0,{ass_of(*a)},{ass_of(*b)},Default,,0,0,0,,{ass_txt}\n")
+        a = b
+    srt = srt_buf.getvalue().strip() + "\n"
+    vtt = vtt_buf.getvalue().strip() + "\n"
 
     # ASS (minimal)
     ass_header = (
@@ -92,19 +152,7 @@ def make_captions_from_text(text: str) -> Dict[str, str]:
         "[Events]\n"
         "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
     )
-    def ass_ts(sec: float) -> str:
-        h = int(sec // 3600)
-        m = int((sec % 3600) // 60)
-        s = int(sec % 60)
-        cs = int((sec - int(sec)) * 100)
-        return f"{h:01d}:{m:02d}:{s:02d}.{cs:02d}"
-
-    t = 0.0
-    events: List[str] = []
-    for txt, dur in segs:
-        events.append(f"Dialogue: 0,{ass_ts(t)},{ass_ts(t+dur)},Default,,0,0,0,,{txt}")
-        t += dur
-    ass = ass_header + "\n".join(events) + "\n"
+    ass = ass_header + ass_buf.getvalue()
 
     return {"srt": srt, "vtt": vtt, "ass": ass}
 
@@ -127,58 +175,125 @@ def make_narration(text: str, voice_id: Optional[str], need_mp3: bool, need_wav:
     # both
     mp3 = synthesize_elevenlabs(text, voice_id=voice_id, out_format="mp3")
     out["mp3"] = mp3
-    # transcode to wav via ffmpeg
-    mp3_path = _write_temp_bytes(".mp3", mp3)
-    wav_path = mp3_path.replace(".mp3", ".wav")
-    _run_ffmpeg(["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", mp3_path, wav_path])
-    out["wav"] = _read_file(wav_path)
-    try:
-        os.remove(mp3_path); os.remove(wav_path)
-    except Exception:
-        pass
+    out["wav"] = _mp3_to_wav(mp3)
     return out
 
+# ffmpeg decodes MP3 from stdin to raw PCM on stdout; the WAV header is written in-process
+_MP3_DECODE_ARGS = [
+    "ffmpeg", "-hide_banner", "-loglevel", "error",
+    "-f", "mp3", "-i", "pipe:0",
+    "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(EL_MP3_RATE), "pipe:1",
+]
+
+def _mp3_to_wav(mp3: bytes) -> bytes:
+    """Decode MP3 bytes to WAV without touching disk."""
+    return pcm_to_wav(_run_ffmpeg(_MP3_DECODE_ARGS, stdin_bytes=mp3), EL_MP3_RATE)
+
+async def _mp3_to_wav_async(mp3: bytes) -> bytes:
+    return pcm_to_wav(await _run_ffmpeg_async(_MP3_DECODE_ARGS, stdin_bytes=mp3), EL_MP3_RATE)
+
 # ---------- mp4 (scaffold)
 
+def _black_mp4_args(audio_bytes: Optional[bytes], ext: str, layout: str,
+                    extra_outputs: Optional[List[str]] = None) -> List[str]:
+    """
+    ffmpeg args for the black render; `extra_outputs` adds outputs fed by the same decode.
+    audio_bytes=None (audio still streaming in) leaves the source unbounded for -shortest.
+    """
+    a_fmt = "wav" if ext.lower() == "wav" else "mp3"
+    size = "1080x1920" if layout == "9:16" else "1920x1080"
+    # Audio goes in over stdin and the MP4 comes back on stdout. The black source is
+    # bounded by the header-derived duration (no ffprobe fork) plus a little slack, and
+    # -shortest trims to the audio; a pipe can't be seeked back for +faststart, so the
+    # MP4 is fragmented.
+    dur = audio_duration(audio_bytes, a_fmt) if audio_bytes is not None else None
+    src = f"color=black:s={size}:r=1" + (f":d={dur + DURATION_SLACK_SEC:.3f}" if dur else "")
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", src,
+        "-f", a_fmt, "-i", "pipe:0",
+        *(extra_outputs or ()),
+        "-map", "0:v", "-map", "1:a",
+        # a constant black frame at 1 fps has nothing for motion search to find; a
+        # keyframe every 10 frames keeps fragments (and seeking) at ~10s granularity
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "stillimage", "-g", "10",
+        "-threads", "0", "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        "-shortest",
+        "-f", "mp4", "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+        "pipe:1"
+    ]
+
 def make_black_mp4_with_audio(audio_bytes: bytes, *, ext: str = "mp3", layout: str = "9:16") -> bytes:
     """
     Create a simple black MP4 matching audio duration (no captions burned).
-    ext: 'mp3' or 'wav' (used to pick the right temp suffix)
+    ext: 'mp3' or 'wav' (input format of the piped audio)
     layout: '9:16' or '16:9'
     """
-    suffix = ".wav" if ext.lower() == "wav" else ".mp3"
-    a_path = _write_temp_bytes(suffix, audio_bytes)
+    return _run_ffmpeg(_black_mp4_args(audio_bytes, ext, layout), stdin_bytes=audio_bytes)
 
-    # duration via ffprobe
-    fp = subprocess.run(
-        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nw=1:nk=1", a_path],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    if fp.returncode != 0:
-        err = fp.stderr.decode("utf-8", "ignore")
-        raise RuntimeError(f"ffprobe failed: {err[:500]}")
-    try:
-        dur = float(fp.stdout.decode().strip())
-        if not (dur > 0):
-            dur = 10.0
-    except Exception:
-        dur = 10.0
+async def make_black_mp4_with_audio_async(audio_bytes: bytes, *, ext: str = "mp3", layout: str = "9:16") -> bytes:
+    """make_black_mp4_with_audio for async endpoints; no worker thread is held during the render."""
+    return await _run_ffmpeg_async(_black_mp4_args(audio_bytes, ext, layout), stdin_bytes=audio_bytes)
 
-    size = "1080x1920" if layout == "9:16" else "1920x1080"
-    v_path = a_path + ".mp4"
-    _run_ffmpeg([
-        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
-        "-f", "lavfi", "-i", f"color=black:s={size}:d={dur}",
-        "-i", a_path,
-        "-c:v", "libx264", "-pix_fmt", "yuv420p",
-        "-c:a", "aac",
-        "-shortest",
-        "-movflags", "+faststart",
-        v_path
-    ])
-    data = _read_file(v_path)
-    try:
-        os.remove(a_path); os.remove(v_path)
-    except Exception:
-        pass
-    return data
+def make_black_mp4_streamed(text: str, voice_id: Optional[str], *, layout: str = "9:16") -> bytes:
+    """
+    Black MP4 rendered while ElevenLabs is still sending the MP3: response chunks go
+    straight into ffmpeg's stdin, so the render overlaps synthesis and the full MP3 is
+    never buffered. Duration isn't known up front, so -shortest alone ends the video.
+    """
+    chunks = synthesize_elevenlabs_stream(text, voice_id=voice_id)
+    return _run_ffmpeg_streaming(_black_mp4_args(None, "mp3", layout), chunks)
+
+def _mp3_to_wav_and_mp4(mp3: bytes, layout: str = "9:16") -> Tuple[bytes, bytes]:
+    """
+    One ffmpeg run for both: the MP3 is decoded once and fanned out to a WAV file and the
+    black MP4 on stdout (two outputs can't share the pipe, so the WAV lands in a temp dir).
+    """
+    with tempfile.TemporaryDirectory(prefix="vox9_") as tmp:
+        wav_path = str(Path(tmp) / "narration.wav")
+        wav_out = ["-map", "1:a", "-c:a", "pcm_s16le", "-ac", "1", "-ar", str(EL_MP3_RATE), wav_path]
+        mp4 = _run_ffmpeg(_black_mp4_args(mp3, "mp3", layout, wav_out), stdin_bytes=mp3)
+        return Path(wav_path).read_bytes(), mp4
+
+def make_narration_and_video(text: str, voice_id: Optional[str], *, layout: str = "9:16") -> Dict[str, bytes]:
+    """MP3 from ElevenLabs, then WAV + black MP4 from a single ffmpeg invocation."""
+    mp3 = synthesize_elevenlabs(text, voice_id=voice_id, out_format="mp3")
+    wav, mp4 = _mp3_to_wav_and_mp4(mp3, layout)
+    return {"mp3": mp3, "wav": wav, "mp4": mp4}
+
+# ---------- orchestration
+
+def make_assets(text: str, voice_id: Optional[str], outputs: List[str], *, layout: str = "9:16") -> Dict[str, bytes]:
+    """
+    Produce the requested outputs (mp3, wav, srt, vtt, ass, mp4) with independent stages overlapped:
+    captions are built while ElevenLabs synthesises, and the WAV transcode and the MP4 render
+    start as soon as the MP3 exists (as one ffmpeg run when both are wanted).
+    """
+    req = {o.lower() for o in outputs}
+    have: Dict[str, bytes] = {}
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        f_caps = ex.submit(make_captions_from_text, text) if req & {"srt", "vtt", "ass"} else None
+        f_wav = f_mp4 = f_both = None
+        if req & {"mp3", "wav", "mp4"}:
+            mp3 = synthesize_elevenlabs(text, voice_id=voice_id, out_format="mp3")
+            if "mp3" in req:
+                have["mp3"] = mp3
+            if {"wav", "mp4"} <= req:
+                f_both = ex.submit(_mp3_to_wav_and_mp4, mp3, layout)
+            elif "wav" in req:
+                f_wav = ex.submit(_mp3_to_wav, mp3)
+            elif "mp4" in req:
+                f_mp4 = ex.submit(make_black_mp4_with_audio, mp3, ext="mp3", layout=layout)
+        if f_caps is not None:
+            caps = f_caps.result()
+            for ext in ("srt", "vtt", "ass"):
+                if ext in req:
+                    have[ext] = caps[ext].encode("utf-8")
+        if f_wav is not None:
+            have["wav"] = f_wav.result()
+        if f_mp4 is not None:
+            have["mp4"] = f_mp4.result()
+        if f_both is not None:
+            have["wav"], have["mp4"] = f_both.result()
+    return have